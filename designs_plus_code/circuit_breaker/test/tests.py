@@ -0,0 +1,241 @@
+import threading
+import time
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from designs_plus_code.circuit_breaker.thread_safe_circuit_breaker import CIRCUIT_BREAKER_STATE, GetAPICircuitBreaker
+
+
+class StubResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class TrialClosesWhileReadingCircuitBreaker(GetAPICircuitBreaker):
+    # Forces an interleaving: once armed, the next read of circuit_breaker_open_ts first lets a concurrent trial close
+    # the circuit, i.e. it happens right after call() has read the state as OPEN.
+
+    def __init__(self, *args, **kwargs):
+        self.armed = False
+        super().__init__(*args, **kwargs)
+
+    @property
+    def circuit_breaker_open_ts(self):
+        if self.armed:
+            self.armed = False
+            self.compare_and_set_state(CIRCUIT_BREAKER_STATE.OPEN, CIRCUIT_BREAKER_STATE.HALF_OPEN)
+            self.compare_and_set_state(CIRCUIT_BREAKER_STATE.HALF_OPEN, CIRCUIT_BREAKER_STATE.CLOSED)
+        return self._open_ts
+
+    @circuit_breaker_open_ts.setter
+    def circuit_breaker_open_ts(self, open_ts):
+        self._open_ts = open_ts
+
+
+class GetAPICircuitBreakerTests(unittest.TestCase):
+
+    def circuit_breaker(self, get, **kwargs):
+        # No server needed: requests go to get(url, json=..., timeout=...) instead of the session
+        cb = GetAPICircuitBreaker(endpoint="http://localhost:8019", **kwargs)
+        cb._session.get = get
+        return cb
+
+    @staticmethod
+    def failing_get(url, json=None, timeout=None):
+        raise ConnectionError("Connection refused")
+
+    def test_failures_spread_beyond_window_do_not_open(self):
+        cb = self.circuit_breaker(self.failing_get, failure_threshold=3, reset_timeout=10, failure_window=0.1)
+        for _ in range(3):
+            assert(cb.call("greet", {}) is None)
+            time.sleep(0.06)    # Any three consecutive failures span more than failure_window
+        assert(cb.state == CIRCUIT_BREAKER_STATE.CLOSED)
+
+    def test_threshold_failures_within_window_open(self):
+        cb = self.circuit_breaker(self.failing_get, failure_threshold=3, reset_timeout=10, failure_window=60)
+        cb.call("greet", {})
+        cb.call("greet", {})
+        assert(cb.state == CIRCUIT_BREAKER_STATE.CLOSED)
+        cb.call("greet", {})
+        assert(cb.state == CIRCUIT_BREAKER_STATE.OPEN)
+
+    def test_success_forgets_failures(self):
+        responses = [ConnectionError(), ConnectionError(), StubResponse(), ConnectionError(), ConnectionError()]
+
+        def get(url, json=None, timeout=None):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10)
+        for _ in range(5):
+            cb.call("greet", {})
+        assert(cb.state == CIRCUIT_BREAKER_STATE.CLOSED)
+
+    def test_half_open_lets_a_single_trial_through(self):
+        trial_started = threading.Event()
+        release_trial = threading.Event()
+        calls = []
+
+        def get(url, json=None, timeout=None):
+            calls.append(url)
+            if cb.state == CIRCUIT_BREAKER_STATE.CLOSED:
+                raise ConnectionError()     # Trips the circuit
+            trial_started.set()
+            release_trial.wait(5)
+            return StubResponse()
+
+        cb = self.circuit_breaker(get, failure_threshold=1, reset_timeout=0)
+        cb.call("greet", {})
+        assert(cb.state == CIRCUIT_BREAKER_STATE.OPEN)
+
+        trial = threading.Thread(target=cb.call, args=("greet", {}))
+        trial.start()
+        assert(trial_started.wait(5))
+        # Every caller while the trial is in flight fails fast
+        results = [cb.call("greet", {}) for _ in range(5)]
+        release_trial.set()
+        trial.join()
+
+        assert(results == [None] * 5)
+        assert(len(calls) == 2)     # The failure that opened the circuit, and the single trial
+        assert(cb.state == CIRCUIT_BREAKER_STATE.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        cb = self.circuit_breaker(self.failing_get, failure_threshold=1, reset_timeout=0)
+        cb.call("greet", {})
+        opened_ts = cb.circuit_breaker_open_ts
+        assert(cb.call("greet", {}) is None)
+        assert(cb.state == CIRCUIT_BREAKER_STATE.OPEN)
+        assert(cb.circuit_breaker_open_ts > opened_ts)
+
+    def test_circuit_closed_between_state_and_timestamp_reads(self):
+        cb = TrialClosesWhileReadingCircuitBreaker(endpoint="http://localhost:8019", failure_threshold=1,
+                                                   reset_timeout=10)
+        cb._session.get = self.failing_get
+        cb.call("greet", {})
+        assert(cb.state == CIRCUIT_BREAKER_STATE.OPEN)
+
+        cb._session.get = lambda url, json=None, timeout=None: StubResponse()
+        cb.armed = True
+        # The state read as OPEN, but the circuit is closed by the time the timestamp is read: goes through as CLOSED
+        assert(cb.call("greet", {}).status_code == 200)
+        assert(cb.state == CIRCUIT_BREAKER_STATE.CLOSED)
+
+    def test_unhashable_args_without_cache(self):
+        cb = self.circuit_breaker(lambda url, json=None, timeout=None: StubResponse(), failure_threshold=3,
+                                  reset_timeout=10)
+        assert(cb.call("greet", {"ids": [1, 2]}).status_code == 200)
+
+    def recording_get(self, outcomes=None):
+        # A stub get that records each request's args and fails while outcomes says so (True: fail); succeeds otherwise,
+        # with a new StubResponse each time
+        calls = []
+        outcomes = outcomes if outcomes is not None else []
+
+        def get(url, json=None, timeout=None):
+            calls.append(json)
+            if outcomes and outcomes.pop(0):
+                raise ConnectionError()
+            return StubResponse()
+
+        return get, calls
+
+    def test_fresh_cached_response_skips_downstream(self):
+        get, calls = self.recording_get()
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10, cache_ttl=10)
+        response = cb.call("greet", {"name": "a"})
+        assert(cb.call("greet", {"name": "a"}) is response)
+        assert(calls == [{"name": "a"}])
+        cb.call("greet", {"name": "b"})     # Different args, not cached yet
+        assert(len(calls) == 2)
+
+    def test_cached_response_refetched_after_ttl(self):
+        get, calls = self.recording_get()
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10, cache_ttl=0.05)
+        response = cb.call("greet", {})
+        time.sleep(0.06)
+        assert(cb.call("greet", {}) is not response)
+        assert(len(calls) == 2)
+
+    def test_stale_response_served_while_open(self):
+        get, calls = self.recording_get([False, True])
+        cb = self.circuit_breaker(get, failure_threshold=1, reset_timeout=10, cache_ttl=0.01)
+        response = cb.call("greet", {})
+        time.sleep(0.02)    # No longer fresh
+        assert(cb.call("greet", {}) is None)    # Fails, and opens the circuit
+        assert(cb.state == CIRCUIT_BREAKER_STATE.OPEN)
+        assert(cb.call("greet", {}) is response)
+        assert(cb.call("greet", {"other": 1}) is None)  # Nothing cached for these args
+        assert(len(calls) == 2)
+
+    def test_stale_response_served_while_half_open_trial_in_flight(self):
+        trial_started = threading.Event()
+        release_trial = threading.Event()
+        get, calls = self.recording_get([False, True])
+
+        def blocking_get(url, json=None, timeout=None):
+            if len(calls) == 2:     # The third request is the trial
+                trial_started.set()
+                release_trial.wait(5)
+            return get(url, json=json, timeout=timeout)
+
+        cb = self.circuit_breaker(blocking_get, failure_threshold=1, reset_timeout=0, cache_ttl=0.01)
+        response = cb.call("greet", {})
+        time.sleep(0.02)
+        cb.call("greet", {})    # Opens the circuit
+        trial = threading.Thread(target=cb.call, args=("greet", {}))
+        trial.start()
+        assert(trial_started.wait(5))
+        assert(cb.call("greet", {}) is response)
+        release_trial.set()
+        trial.join()
+        assert(len(calls) == 3)
+
+    def test_stale_response_not_served_past_ceiling(self):
+        get, calls = self.recording_get([False, True])
+        cb = self.circuit_breaker(get, failure_threshold=1, reset_timeout=10, cache_ttl=0.01,
+                                  persistent_stale_ceiling=0.1)
+        response = cb.call("greet", {})
+        time.sleep(0.02)
+        cb.call("greet", {})    # Opens the circuit
+        assert(cb.call("greet", {}) is response)
+        time.sleep(0.1)
+        assert(cb.call("greet", {}) is None)
+
+    def test_cache_evicts_beyond_max_entries(self):
+        get, calls = self.recording_get()
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10, cache_ttl=10, max_cache_entries=2)
+        for name in ["a", "b", "c"]:
+            cb.call("greet", {"name": name})
+        assert(len(cb._cache) == 2)
+        cb.call("greet", {"name": "c"})
+        assert(len(calls) == 3)
+        cb.call("greet", {"name": "a"})     # The oldest entry, evicted when "c" was cached
+        assert(len(calls) == 4)
+
+    def test_cache_evicts_entries_past_retention(self):
+        get, calls = self.recording_get()
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10, cache_ttl=0.01,
+                                  persistent_stale_ceiling=0.02)
+        cb.call("greet", {"name": "a"})
+        time.sleep(0.03)    # Older than both cache_ttl and the ceiling: can never be served again
+        cb.call("greet", {"name": "b"})
+        assert(list(cb._cache) == [cb.make_cache_key("greet", {"name": "b"})])
+
+    def test_unserializable_args_are_not_cached(self):
+        get, calls = self.recording_get()
+        cb = self.circuit_breaker(get, failure_threshold=3, reset_timeout=10, cache_ttl=10)
+        args = {"ids": {1, 2}}  # A set: not JSON serializable
+        assert(cb.call("greet", args).status_code == 200)
+        assert(cb.call("greet", args).status_code == 200)
+        assert(len(calls) == 2)
+        assert(cb._cache == {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,28 +8,36 @@ CLOSED
 * Normal operation.
 * All calls allowed.
 * Track failures.
-* If failures exceed a threshold, switch to OPEN.
+* If failure_threshold failures happen within failure_window seconds, switch to OPEN.
 
 OPEN
 * Calls should fail fast (do NOT execute the underlying function).
-* After reset_timeout seconds, move to HALF-OPEN.
+* After reset_timeout seconds, move to HALF-OPEN. This is evaluated lazily, by the first call after the timeout.
 
 HALF-OPEN
 * Allow a single test call through.
-* If it succeeds → transition back to CLOSED and reset failure count.
+* If it succeeds → transition back to CLOSED and forget recorded failures.
 * If it fails → transition back to OPEN and restart the cooldown timer.
 
+Response caching (optional, enabled with cache_ttl > 0)
+* Successful responses are cached per (api_endpoint, args), for at most max_cache_entries distinct calls.
+* A cached response younger than cache_ttl is returned without calling the downstream.
+* Calls that are failed fast (OPEN, or HALF-OPEN with a trial in flight) get the stale cached response instead of None,
+  as long as it is younger than persistent_stale_ceiling (no limit if None).
+
 """
+import collections
+import json
 import logging
 import subprocess
 import threading
 import time
 from enum import Enum
 from abc import ABC, abstractmethod
-from threading import Thread
 
 import requests
 from flask import Response, make_response
+from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, ConnectionError, Timeout, ConnectTimeout, TooManyRedirects
 import sys
 
@@ -48,135 +56,239 @@ class RESPONSE_TYPE(Enum):
 
 
 class GetAPICircuitBreaker:
-    def __init__(self, endpoint: str, failure_threshold, reset_timeout, request_timeout = 5):     # Timeout: 5 seconds by default
+    def __init__(self, endpoint: str, failure_threshold, reset_timeout, request_timeout = 5,     # Timeout: 5 seconds by default
+                 cache_ttl = 0, persistent_stale_ceiling = None,                                  # Caching is disabled by default
+                 failure_window = 60, max_cache_entries = 1024):
 
         # Mutable State variables
         self.state = CIRCUIT_BREAKER_STATE.CLOSED
-        self.first_failure_ts = None
         self.circuit_breaker_open_ts = None
-        self.num_failures = 0
+        # Timestamps of the most recent failures since the last success. Bounded: only the last failure_threshold
+        # failures can decide whether to trip, so older ones fall off automatically.
+        self.failure_times = collections.deque(maxlen=failure_threshold)
+        self.half_open_trial_in_flight = False  # Only one trial request is let through while half open
+        self._cache = {}                        # (api_endpoint, args as JSON): (response, cached_ts), oldest first
 
         #Immutable state variables
         self.failure_threshold = failure_threshold  # Number of failures before the circuit is opened.
+        self.failure_window = failure_window        # Seconds within which failure_threshold failures must happen to open
         self.reset_timeout = reset_timeout          # Seconds elapsed before the circuit half-opened from open
         self.request_timeout = request_timeout      # Timeout for each get request, before marking it as failed
         self.api_base_url = endpoint                #
-        self.lock = threading.Lock()
+        self.lock = threading.Lock()                # Guards state transitions and counters only. Never held across a request.
         self.health_endpoint = "health" # Hardcoding for now
+        self.cache_ttl = cache_ttl                              # Seconds for which a cached response is served as fresh
+        self.persistent_stale_ceiling = persistent_stale_ceiling  # Max age of a stale response served while failing fast
+        self.max_cache_entries = max_cache_entries
+        # Age past which a cached response can never be served again (None: stale responses are served at any age)
+        self._cache_retention = None if persistent_stale_ceiling is None else max(cache_ttl, persistent_stale_ceiling)
+        self._cache_lock = threading.Lock()     # Serializes cache writes and evictions. Reads don't take it.
 
-        Thread(target = self.watcher).start()   # Starting a watcher to keep track of the seconds elapsed in open state
+        # One session for all calls, so connections to the downstream are pooled and reused instead of being
+        # opened for every request. Sized for many concurrent callers, now that calls are not serialized.
+        self._session = requests.Session()
+        self._session.mount(self.api_base_url, HTTPAdapter(pool_connections=16, pool_maxsize=64))
 
 
     def call(self, api_endpoint: str, args: dict) -> Response:
-        with self.lock:
-            if self.state == CIRCUIT_BREAKER_STATE.CLOSED:
-                try:
-                    # Allow call
-                    response = requests.get(self.api_base_url + "/" + api_endpoint, json=args, timeout=self.request_timeout)
-                    response.raise_for_status()
-                    # If flow reaches this point, the request passed.
-                    #   update first_failure_ts to None
-                    #   set num_failures to zero
-                    self.first_failure_ts = None
-                    self.num_failures = 0
-                    logging.debug("Request passed.")
-                    self.log_state_variables()
-                    return response
-                # If call fails:
-                #   increment num_failures
-                #   if first_failure_ts is None:
-                #       set first_failure_ts to current timestamp
-                #   If num_failures >= failure_threshold:
-                #       change state to OPEN
-                #       set circuit_breaker_open_ts to current timestamp
-                except (HTTPError, ConnectionError, Timeout, ConnectTimeout, TooManyRedirects) as e:
-                    self.num_failures+=1
-                    current_time = time.monotonic()
-                    if self.first_failure_ts is None:
-                        self.first_failure_ts = current_time
-                    if self.num_failures >= self.failure_threshold:
-                        self.state = CIRCUIT_BREAKER_STATE.OPEN
-                        self.circuit_breaker_open_ts = current_time
-                    logging.debug("Request failed.")
-                    logging.debug(
-                        "Current state variables:"
-                        f"  state: {self.state}" +
-                        f"  first_failure_ts: {self.first_failure_ts}\n"
-                        f"  circuit_breaker_open_ts: {self.circuit_breaker_open_ts}\n"
-                        f"  num_failures: {self.num_failures}\n"
-                    )
-                    #return make_response(f"Request failed. Reason: {type(e).__name__}", 500)
-                    return None
-                except Exception as e:
-                    raise Exception("Unhandled exception occured. Details: "+e)
-
-
-            elif self.state == CIRCUIT_BREAKER_STATE.OPEN:
-                # Fail request
-                #return make_response(f"Request failed. Reason: Circuit Open", 500)
+        cache_key = self.make_cache_key(api_endpoint, args) if self.cache_ttl > 0 else None
+        if cache_key is not None:
+            cached_response = self.get_cached_response(cache_key, self.cache_ttl)
+            if cached_response is not None:
+                logging.debug("Serving cached response.")
+                return cached_response
+
+        state = self.state  # Read once. Reference reads are atomic, so no lock is needed to pick the branch.
+        if state == CIRCUIT_BREAKER_STATE.OPEN:
+            # evaluate seconds_open = current_ts - circuit_breaker_open_ts
+            # if  seconds_open >= reset_timeout
+            #   Change state to HALF_OPEN, and let this call be the trial request
+            # The timestamp is read once: a trial that closes the circuit meanwhile clears it to None.
+            open_ts = self.circuit_breaker_open_ts
+            if open_ts is None:
+                # The circuit has already left OPEN since state was read. Go by the state it is in now.
+                state = self.state
+            elif time.monotonic() - open_ts >= self.reset_timeout:
+                if self.compare_and_set_state(CIRCUIT_BREAKER_STATE.OPEN, CIRCUIT_BREAKER_STATE.HALF_OPEN):
+                    logging.debug("Reset timeout reached. Moving circuit state to half open.")
+                state = self.state
+
+        if state == CIRCUIT_BREAKER_STATE.CLOSED:
+            try:
+                # Allow call. The request goes out with no lock held, so concurrent callers are not serialized.
+                response = self._session.get(self.api_base_url + "/" + api_endpoint, json=args, timeout=self.request_timeout)
+                response.raise_for_status()
+                # If flow reaches this point, the request passed.
+                #   forget recorded failures
+                self.reset_failures()
+                self.cache_response(cache_key, response)
+                logging.debug("Request passed.")
+                self.log_state_variables()
+                return response
+            # If call fails:
+            #   record the failure timestamp
+            #   If the last failure_threshold failures happened within failure_window:
+            #       change state to OPEN
+            #       set circuit_breaker_open_ts to current timestamp
+            except (HTTPError, ConnectionError, Timeout, ConnectTimeout, TooManyRedirects) as e:
+                # Act on the result computed together with our own failure, not on a re-read of the failures, so that
+                # concurrent failures cannot both miss the threshold crossing. Only one of them wins the transition.
+                if self.record_failure():
+                    self.compare_and_set_state(CIRCUIT_BREAKER_STATE.CLOSED, CIRCUIT_BREAKER_STATE.OPEN)
+                logging.debug("Request failed.")
+                self.log_state_variables()
+                #return make_response(f"Request failed. Reason: {type(e).__name__}", 500)
                 return None
+            except Exception as e:
+                raise Exception(f"Unhandled exception occured. Details: {e}")
 
-            elif self.state == CIRCUIT_BREAKER_STATE.HALF_OPEN:
-                try:
-                    # Allow call
-                    # If call fails:
-                    #   Change state to open
-                    #   set circuit_breaker_open_ts to current timestamp
-                    #   increment num_failures
-                    response = requests.get(self.api_base_url + "/" + api_endpoint, json=args, timeout=self.request_timeout)
-                    response.raise_for_status()
-                    # If the flow reaches this point, the request passed.
-                    self.state = CIRCUIT_BREAKER_STATE.CLOSED
-                    self.first_failure_ts = None
-                    self.circuit_breaker_open_ts = None
-                    self.num_failures = 0
-                    logging.debug("Request passed while on Half Open. Circuit is now closed.")
-                    self.log_state_variables()
-                    return response
-
-                except (HTTPError, ConnectionError, Timeout, ConnectTimeout, TooManyRedirects) as e:
-                    logging.debug("Request failed while on Half Open. Circuit is now open again.")
-                    self.state = CIRCUIT_BREAKER_STATE.OPEN
-                    current_time = time.monotonic()
-                    self.circuit_breaker_open_ts = current_time
-                    self.num_failures+=1
-
-                    self.log_state_variables()
-                    #return make_response("Request failed. Circuit open", 500)
-                    return None
-                except Exception as e:
-                    raise Exception("Unhandled exception occured. Details: "+e)
-                # Else:
-                #   Change state to closed
-                #   Set first_failure_ts to None
-                #   Set num_failures to zero
-                #   Set circuit_breaker_open_ts to None
-            else:
-                raise Exception("Unhandled exception. Circuit breaker is in an unknown state.")
+
+        elif state == CIRCUIT_BREAKER_STATE.OPEN:
+            # Fail request, degrading to a stale cached response if there is one
+            #return make_response(f"Request failed. Reason: Circuit Open", 500)
+            return self.get_stale_response(cache_key)
+
+        elif state == CIRCUIT_BREAKER_STATE.HALF_OPEN:
+            if not self.acquire_half_open_trial():
+                # Another caller's trial request is in flight. Fail fast until it settles the state.
+                return self.get_stale_response(cache_key)
+            try:
+                # Allow call
+                # If call fails:
+                #   Change state to open
+                #   set circuit_breaker_open_ts to current timestamp
+                #   record the failure timestamp
+                response = self._session.get(self.api_base_url + "/" + api_endpoint, json=args, timeout=self.request_timeout)
+                response.raise_for_status()
+                # If the flow reaches this point, the request passed.
+                self.compare_and_set_state(CIRCUIT_BREAKER_STATE.HALF_OPEN, CIRCUIT_BREAKER_STATE.CLOSED)
+                self.cache_response(cache_key, response)
+                logging.debug("Request passed while on Half Open. Circuit is now closed.")
+                self.log_state_variables()
+                return response
+
+            except (HTTPError, ConnectionError, Timeout, ConnectTimeout, TooManyRedirects) as e:
+                logging.debug("Request failed while on Half Open. Circuit is now open again.")
+                self.record_failure()
+                self.compare_and_set_state(CIRCUIT_BREAKER_STATE.HALF_OPEN, CIRCUIT_BREAKER_STATE.OPEN)
+
+                self.log_state_variables()
+                #return make_response("Request failed. Circuit open", 500)
+                return None
+            except Exception as e:
+                # Hand the trial slot back, otherwise the circuit would stay half open with no way to probe again.
+                with self.lock:
+                    self.half_open_trial_in_flight = False
+                raise Exception(f"Unhandled exception occured. Details: {e}")
+            # Else:
+            #   Change state to closed
+            #   Forget recorded failures
+            #   Set circuit_breaker_open_ts to None
+        else:
+            raise Exception("Unhandled exception. Circuit breaker is in an unknown state.")
+
+    def compare_and_set_state(self, expected_state: CIRCUIT_BREAKER_STATE, new_state: CIRCUIT_BREAKER_STATE) -> bool:
+        # Moves the circuit to new_state only if it is still in expected_state, and returns whether it did.
+        # Callers decide on a transition from a state read without the lock, so the check has to be repeated
+        # under the lock. Book-keeping tied to the transition is done in the same critical section.
+        with self.lock:
+            if self.state != expected_state:
+                return False
+            # Timestamps are written before the state, so a lock-free reader that sees OPEN also sees its timestamp.
+            if new_state == CIRCUIT_BREAKER_STATE.OPEN:
+                self.circuit_breaker_open_ts = time.monotonic()
+            elif new_state == CIRCUIT_BREAKER_STATE.CLOSED:
+                self.circuit_breaker_open_ts = None
+                self.failure_times.clear()
+            self.half_open_trial_in_flight = False
+            self.state = new_state
+            return True
+
+    def acquire_half_open_trial(self) -> bool:
+        # Lets exactly one caller through while the circuit is half open.
+        if self.half_open_trial_in_flight:
+            return False    # Unlocked pre-check: callers rejected while the trial runs don't queue up on the lock
+        with self.lock:
+            if self.state != CIRCUIT_BREAKER_STATE.HALF_OPEN or self.half_open_trial_in_flight:
+                return False
+            self.half_open_trial_in_flight = True
+            return True
+
+    def record_failure(self) -> bool:
+        # Atomically records a failure, and returns whether the last failure_threshold failures (including this one)
+        # all happened within failure_window seconds, i.e. whether the circuit should open.
+        with self.lock:
+            current_time = time.monotonic()
+            self.failure_times.append(current_time)
+            return (
+                len(self.failure_times) == self.failure_threshold
+                and current_time - self.failure_times[0] <= self.failure_window
+            )
+
+    def reset_failures(self):
+        if not self.failure_times:
+            return  # Unlocked pre-check: on the happy path there is nothing to reset, so successes don't take the lock
+        with self.lock:
+            self.failure_times.clear()
+
+    @staticmethod
+    def make_cache_key(api_endpoint: str, args: dict):
+        # args is sent as the JSON body, so its canonical JSON form identifies the call, whatever values it holds.
+        # None (the call isn't cached) if args can't be serialized this way.
+        try:
+            return api_endpoint, json.dumps(args, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+
+    def cache_response(self, cache_key: tuple, response: Response):
+        if cache_key is None:
+            return
+        now = time.monotonic()
+        with self._cache_lock:
+            cache = self._cache
+            cache.pop(cache_key, None)  # Re-inserted at the end, which keeps the dict ordered by cached_ts
+            cache[cache_key] = (response, now)
+            # Evict from the oldest end: entries beyond max_cache_entries, then entries too old to ever be served
+            while cache:
+                oldest_key = next(iter(cache))
+                if len(cache) > self.max_cache_entries or (
+                    self._cache_retention is not None and now - cache[oldest_key][1] >= self._cache_retention
+                ):
+                    del cache[oldest_key]
+                else:
+                    break
+
+    def get_cached_response(self, cache_key: tuple, max_age) -> Response:
+        # Returns the cached response for cache_key if it is younger than max_age seconds (any age if max_age is None)
+        if cache_key is None:
+            return None
+        cached = self._cache.get(cache_key)
+        if cached is None:
+            return None
+        response, cached_ts = cached
+        if max_age is not None and time.monotonic() - cached_ts >= max_age:
+            return None
+        return response
+
+    def get_stale_response(self, cache_key: tuple) -> Response:
+        response = self.get_cached_response(cache_key, self.persistent_stale_ceiling)
+        if response is not None:
+            logging.debug("Circuit is not closed. Serving stale cached response.")
+        return response
 
     def log_state_variables(self):
+        # Called on every request. Arguments are only formatted if DEBUG records are actually emitted, and the level
+        # check lets us skip even building the argument list when they aren't.
+        if not logging.getLogger().isEnabledFor(logging.DEBUG):
+            return
         logging.debug(
             "Current state variables:\n"
-            f"  state: {self.state}\n" +
-            f"  first_failure_ts: {self.first_failure_ts}\n"
-            f"  circuit_breaker_open_ts: {self.circuit_breaker_open_ts}\n"
-            f"  num_failures: {self.num_failures}\n"
+            "  state: %s\n"
+            "  circuit_breaker_open_ts: %s\n"
+            "  recent_failure_times: %s\n",
+            self.state, self.circuit_breaker_open_ts, list(self.failure_times)
         )
 
-    def watcher(self):
-        while True:
-            with self.lock:
-                if self.state == CIRCUIT_BREAKER_STATE.OPEN:
-                    # evaluate seconds_open = current_ts - circuit_breaker_open_ts
-                    # if  seconds_open >= reset_timeout
-                    #   Change state to HALF_OPEN
-                    current_time = time.monotonic()
-                    seconds_open = current_time - self.circuit_breaker_open_ts
-                    logging.debug(f"Second Elapsed since circuit open: {seconds_open}")
-                    if seconds_open >= self.reset_timeout:
-                        logging.debug("Reset timeout reached. Moving circuit state to half open.")
-                        self.state = CIRCUIT_BREAKER_STATE.HALF_OPEN # Moving from open to half open
-            time.sleep(1) # Check every second
 
 
 class CircuitOpenException(Exception):
@@ -189,7 +301,7 @@ if __name__ == "__main__":
 
     cb = GetAPICircuitBreaker(
         endpoint="http://localhost:8019",
-        failure_threshold=5,        # After 5 consecutive failures, change state to open
+        failure_threshold=5,        # After 5 failures within failure_window (60 seconds by default), change state to open
         reset_timeout=10,           # after 10 seconds in the open state, move to half open
         request_timeout=2           # Timeout of 2 seconds for each request
     )
@@ -204,11 +316,10 @@ if __name__ == "__main__":
     cb.call("/greetAfterSleep", {})       # Should timeout
     cb.call("/greetAfterSleep", {})       # Should timeout
     cb.state == CIRCUIT_BREAKER_STATE.OPEN # Should open circuit after 5 failures
-    time.sleep(12) # After this sleep, the watcher daemon should change the state to Half open
-    assert cb.state == CIRCUIT_BREAKER_STATE.HALF_OPEN
+    assert cb.call("/greet", {}) is None  # Fails fast while open
+    time.sleep(12) # After this sleep, the next call should move the state to Half open and go through as the trial
     cb.call("/greetAfterSleep", {})       # Should timeout
     assert cb.state == CIRCUIT_BREAKER_STATE.OPEN               # Open again after the above failure
-    time.sleep(12)  # After this sleep, the watcher daemon should change the state to Half open
-    assert cb.state == CIRCUIT_BREAKER_STATE.HALF_OPEN
+    time.sleep(12)  # After this sleep, the next call should move the state to Half open and go through as the trial
     assert cb.call("/greet", {}).status_code == 200     # First request when half open. Should pass.
     assert cb.state == CIRCUIT_BREAKER_STATE.CLOSED   # Should now be closed
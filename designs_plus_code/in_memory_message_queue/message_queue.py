@@ -3,11 +3,11 @@ An in-memory, thread-safe, multi-producer, multi-subscriber message queue with t
 
 1. Queue operations
     A class MessageQueue with:
-        publish(topic: str, message: str) -> None
+        publish(topic: str, message: bytes) -> None
             Adds a message to a topic.
         subscribe(topic: str) -> Subscriber
             Returns a Subscriber object that can consume messages from that topic.
-        Subscriber.poll(timeout: Optional[float] = None) -> Optional[str]
+        Subscriber.poll(timeout: Optional[float] = None) -> Optional[bytes]
             Blocking call: waits for the next message, or returns None on timeout.
 
 2. Behavior
@@ -16,8 +16,13 @@ An in-memory, thread-safe, multi-producer, multi-subscriber message queue with t
     * poll() should block efficiently, not busy-wait.
 
 No message loss — all subscribers receive all messages (independent cursors).
+
+Message payloads are bytes. Producers encode once when publishing and subscribers decode when consuming, so the queue
+never converts between str and bytes itself, and stored payloads don't carry str's per-object overhead.
 """
 import asyncio
+import collections
+import itertools
 import random
 import threading
 import time
@@ -29,35 +34,96 @@ logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
 class Topic:
     def __init__(self, name: str, max_size: int = 10):
         self.name = name
-        self.queue = []
+        # Messages and their publish timestamps are kept in two parallel deques rather than one deque of tuples, so there
+        # is no tuple per message. Once full, each publish evicts the oldest entry from both in O(1).
+        self.messages = collections.deque(maxlen=max_size)
+        self.timestamps = collections.deque(maxlen=max_size)
         self.max_size = max_size
-        self.first_offset = -1
+        self.base_offset = 0    # Offset of the message at messages[0]
         self.last_offset = -1
-
-    def publish(self, message: str):
-        self.queue.append((message, time.monotonic())) # Message string and the time of consumption, to be used later for TTL based deletion
-        if self.first_offset == -1:
-            self.first_offset = 0
+        # Push delivery: one queue of (message, timestamp) per subscriber that receives through receive_messages, fed by
+        # publish. A subscriber just awaits its own queue, so it is neither polling nor competing with other subscribers
+        # for the topic. Subscribers that only consume by offset have no queue.
+        self.subscriber_queues = {}  # subscriber_id: (asyncio.Queue, event loop the subscriber awaits it on)
+
+    def publish(self, message: bytes):
+        if len(self.messages) == self.max_size:
+            self.base_offset += 1   # The appends below evict messages[0] and timestamps[0]
+        published_ts = time.monotonic()    # Time of publishing, used for TTL based deletion
+        self.messages.append(message)
+        self.timestamps.append(published_ts)
         self.last_offset += 1
+        # The fan-out cost is paid once, here, instead of by every subscriber fetching the same message. asyncio queues
+        # aren't thread-safe, and a put from another thread wouldn't wake the waiting subscriber, so the delivery is
+        # handed to the subscriber's own loop. Callbacks run in the order they're scheduled, so messages stay in order.
+        closed = []
+        for subscriber_id, (subscriber_queue, loop) in self.subscriber_queues.items():
+            try:
+                loop.call_soon_threadsafe(self.deliver, subscriber_id, subscriber_queue, message, published_ts)
+            except RuntimeError:    # The subscriber's loop is closed: nobody will ever read this queue
+                closed.append(subscriber_id)
+        for subscriber_id in closed:
+            del self.subscriber_queues[subscriber_id]
+
+    def add_subscriber_queue(self, subscriber_id: str, loop: asyncio.AbstractEventLoop):
+        # Expects to be called on loop, with the topic lock held. Returns the subscriber's queue.
+        if subscriber_id in self.subscriber_queues:
+            return self.subscriber_queues[subscriber_id][0]
+        # Bounded like the topic itself. Seeded with the retained messages, so a new subscriber starts from the
+        # oldest retained message, as an offset-based consumer starting at -1 would.
+        subscriber_queue = asyncio.Queue(maxsize=self.max_size)
+        for message, ts in zip(self.messages, self.timestamps):
+            subscriber_queue.put_nowait((message, ts))
+        self.subscriber_queues[subscriber_id] = (subscriber_queue, loop)
+        return subscriber_queue
+
+    def deliver(self, subscriber_id: str, subscriber_queue: asyncio.Queue, message: bytes, ts: float):
+        # Runs on the subscriber's loop
+        if subscriber_queue.full():
+            # The subscriber is max_size messages behind. Drop its oldest message, like the topic's own retention does.
+            subscriber_queue.get_nowait()
+            logging.warning("Subscriber %s is lagging behind topic %s. 1 message was lost.", subscriber_id, self.name)
+        subscriber_queue.put_nowait((message, ts))
 
     def fetch(self, offset: int):
+        # offset is the last offset the client has consumed. Returns the messages after it.
         if offset <= self.last_offset:
-            return self.queue[(offset - self.first_offset + 1):], self.last_offset
+            if offset + 1 < self.base_offset:
+                # The next message this client expects has already been evicted or expired. Serve what is retained,
+                # but make the gap visible instead of silently jumping over it.
+                logging.warning(
+                    "Client offset %s is behind the retained messages of topic %s. %s message(s) were lost.",
+                    offset, self.name, self.base_offset - offset - 1
+                )
+            start = max(0, offset - self.base_offset + 1)
+            # Walk in from the right end: subscribers usually trail the head, so this is O(new messages), not O(queue)
+            num_new = len(self.messages) - start
+            new_messages = list(zip(
+                itertools.islice(reversed(self.messages), num_new),
+                itertools.islice(reversed(self.timestamps), num_new)
+            ))
+            new_messages.reverse()
+            return new_messages, self.last_offset
         else:
             raise Exception(f"Client offset {offset} is out of range")
 
     # 0, 1, 2, [3, 4, 5, 6, 7, 8, 9, 10, 11, 12] - 10 messages in queue, 3 deleted
     # last offset: 12
-    # First offset: 3
+    # base offset: 3
     # client offset: 8
-    # queue[8 - 3 + 1:]
+    # messages[8 - 3 + 1:]
 
     def poll(self, offset: int):
         return self.last_offset > offset
 
-    def delete_messages(self):
-        # Delete messages that are older than a certain timestamp
-        raise NotImplementedError()
+    def delete_messages(self, cutoff: float):
+        # Delete messages that were published before cutoff (a time.monotonic() timestamp). Messages are in publish
+        # order, so expired ones are always at the left end, where a deque reads and pops in O(1).
+        timestamps = self.timestamps
+        while timestamps and timestamps[0] < cutoff:
+            self.messages.popleft()
+            timestamps.popleft()
+            self.base_offset += 1
 
 
 class MessageQueue:
@@ -87,7 +153,7 @@ class MessageQueue:
             raise Exception(f"Error: {topic_id} does not exist.")
         self._subscribers[topic_id].add(subscriber_id)
 
-    def publish_message(self, topic_id: str, message:str, producer_id: str):
+    def publish_message(self, topic_id: str, message: bytes, producer_id: str):
         if not topic_id in self._topics:
             raise Exception(f"Error: {topic_id} does not exist.")
 
@@ -106,16 +172,41 @@ class MessageQueue:
             raise Exception(f"Subscriber {subscriber_id} is not onboarded.")
 
         topic, topic_lock = self._topics[topic_id]
+        # The lock stays for fetch: iterating the deque while another thread appends to it would raise. It is only
+        # held to copy out the new messages, so it costs publishers O(new messages) per fetch.
         with topic_lock:
             messages_with_timestamps, new_offset =  topic.fetch(offset)
-            return messages_with_timestamps, new_offset
+        return messages_with_timestamps, new_offset
 
     def poll_topic(self, topic_id: str, offset: int):
         if not topic_id in self._topics:
             raise Exception(f"Error: {topic_id} does not exist.")
+        topic, _ = self._topics[topic_id]
+        # No lock: poll only reads last_offset, a single attribute read that is atomic. A publish racing with it is
+        # either seen now or on the next poll, and no message is skipped either way.
+        return topic.poll(offset)
+
+    async def receive_messages(self, topic_id: str, subscriber_id: str):
+        # Blocks until the subscriber has at least one message pushed to it, then returns everything pending for it,
+        # as a list of (message, timestamp). Publishers may run on any thread. The subscriber's queue is created on its
+        # first call, starting from the oldest message retained then, and is tied to the loop that call runs on.
+        if not topic_id in self._topics:
+            raise Exception(f"Error: {topic_id} does not exist.")
+
+        if not subscriber_id in self._subscribers[topic_id]:
+            raise Exception(f"Subscriber {subscriber_id} is not onboarded.")
+
         topic, topic_lock = self._topics[topic_id]
-        with topic_lock:
-            return topic.poll(offset)
+        queue_and_loop = topic.subscriber_queues.get(subscriber_id)
+        if queue_and_loop is None:
+            with topic_lock:
+                subscriber_queue = topic.add_subscriber_queue(subscriber_id, asyncio.get_running_loop())
+        else:
+            subscriber_queue = queue_and_loop[0]
+        messages_with_timestamps = [await subscriber_queue.get()]
+        while not subscriber_queue.empty():
+            messages_with_timestamps.append(subscriber_queue.get_nowait())
+        return messages_with_timestamps
 
     def cleanup_topics(self):
         raise NotImplementedError()
@@ -132,15 +223,15 @@ class Producer:
         for i in range(10):
             await asyncio.sleep(random.randint(1,10)) # Sleep upto 10 seconds before producing again
             message_to_produce = str(i)
-            logging.debug(f"Producer: {self.id}. Message produced: {message_to_produce} to topic {self.topic_id}")
-            self.queue.publish_message(self.topic_id, message_to_produce, self.id)
+            logging.debug("Producer: %s. Message produced: %s to topic %s", self.id, message_to_produce, self.topic_id)
+            self.queue.publish_message(self.topic_id, message_to_produce.encode(), self.id)
 
     async def produce_random_integers(self):
         for i in range(10):
             message_to_produce = str(random.randint(1, 100))
             await asyncio.sleep(random.randint(1,10)) # Sleep upto 10 seconds before producing again
-            logging.debug(f"Producer: {self.id}. Message produced: {message_to_produce} to topic {self.topic_id}")
-            self.queue.publish_message(self.topic_id, message_to_produce, self.id)
+            logging.debug("Producer: %s. Message produced: %s to topic %s", self.id, message_to_produce, self.topic_id)
+            self.queue.publish_message(self.topic_id, message_to_produce.encode(), self.id)
 
 
 class Subscriber:
@@ -148,22 +239,13 @@ class Subscriber:
         self.id = id
         self.topic_id = topic_id
         self.queue = queue
-        self.offset = -1
         self.queue.add_subscriber(topic_id, id)
-        self.backoff = 1 # Sleep these many seconds before polling again.
 
     async def consume_messages(self):
         while True:
-            await asyncio.sleep(self.backoff)
-            if self.queue.poll_topic(self.topic_id, self.offset):
-                messages, new_offset = self.queue.consume_messages(self.topic_id, self.offset, self.id)
-                self.offset = new_offset
-                for message, ts in messages:
-                    logging.debug(f"Consumer: {self.id}. Message consumed: {message}")
-                self.backoff = 1 # Resetting backoff
-            else:
-                logging.debug(f"Subscriber {self.id}: No new messages produced in topic {self.topic_id}. Waiting {self.backoff} second(s).")
-                self.backoff = min(self.backoff*2, 300) # Cap at 5 mins.
+            messages = await self.queue.receive_messages(self.topic_id, self.id)   # Woken up by the next publish to the topic
+            for message, ts in messages:
+                logging.debug("Consumer: %s. Message consumed: %s", self.id, message.decode())
 
 
 async def main():
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from designs_plus_code.in_memory_message_queue.message_queue import MessageQueue, Topic
+
+
+class TopicTests(unittest.TestCase):
+
+    def publish_all(self, topic, messages):
+        for message in messages:
+            topic.publish(message)
+
+    def fetched_messages(self, topic, offset):
+        messages_with_timestamps, _ = topic.fetch(offset)
+        return [message for message, ts in messages_with_timestamps]
+
+    def test_fetch_from_initial_offset_returns_all_messages(self):
+        topic = Topic("test")
+        self.publish_all(topic, [b"0", b"1", b"2"])
+        assert(self.fetched_messages(topic, -1) == [b"0", b"1", b"2"])
+
+    def test_fetch_returns_messages_after_offset(self):
+        topic = Topic("test")
+        self.publish_all(topic, [b"0", b"1", b"2"])
+        assert(self.fetched_messages(topic, 0) == [b"1", b"2"])
+        assert(self.fetched_messages(topic, 2) == [])
+        assert(topic.fetch(2)[1] == 2)
+
+    def test_fetch_from_empty_topic(self):
+        topic = Topic("test")
+        assert(topic.fetch(-1) == ([], -1))
+
+    def test_fetch_after_eviction_reports_lost_messages(self):
+        topic = Topic("test", max_size=3)
+        self.publish_all(topic, [b"0", b"1", b"2", b"3", b"4"])
+        assert(self.fetched_messages(topic, 2) == [b"3", b"4"])
+        with self.assertLogs(level="WARNING"):
+            assert(self.fetched_messages(topic, -1) == [b"2", b"3", b"4"])
+
+    def test_delete_messages_keeps_offsets(self):
+        topic = Topic("test")
+        self.publish_all(topic, [b"0", b"1"])
+        cutoff = time.monotonic()
+        self.publish_all(topic, [b"2"])
+        topic.delete_messages(cutoff)
+        assert(topic.base_offset == 2)
+        assert(self.fetched_messages(topic, 1) == [b"2"])
+
+
+class MessageQueueTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.mq = MessageQueue()
+        self.mq.add_topic("T1", "test")
+        self.mq.add_producer("T1", "P1")
+        self.mq.add_subscriber("T1", "S1")
+
+    def publish_all(self, messages):
+        for message in messages:
+            self.mq.publish_message("T1", message, "P1")
+
+    async def received_messages(self):
+        messages_with_timestamps = await asyncio.wait_for(self.mq.receive_messages("T1", "S1"), 2)
+        return [message for message, ts in messages_with_timestamps]
+
+    async def test_receive_gets_retained_then_new_messages(self):
+        self.publish_all([b"0", b"1"])
+        assert(await self.received_messages() == [b"0", b"1"])
+        self.publish_all([b"2"])
+        assert(await self.received_messages() == [b"2"])
+
+    async def test_publish_from_another_thread_wakes_receiver(self):
+        publisher = threading.Timer(0.1, self.publish_all, args=([b"0"],))
+        publisher.start()
+        start = time.monotonic()
+        assert(await self.received_messages() == [b"0"])
+        assert(time.monotonic() - start < 1)
+        publisher.join()
+
+    async def test_lagging_receiver_loses_oldest_messages(self):
+        topic, _ = self.mq._topics["T1"]
+        topic.add_subscriber_queue("S1", asyncio.get_running_loop())
+        with self.assertLogs(level="WARNING"):
+            self.publish_all([str(i).encode() for i in range(topic.max_size + 1)])
+            await asyncio.sleep(0)  # Lets the deliveries scheduled on this loop run
+        assert(await self.received_messages() == [str(i).encode() for i in range(1, topic.max_size + 1)])
+
+    async def test_offset_consumer_has_no_queue_to_lag_behind(self):
+        with self.assertNoLogs(level="WARNING"):
+            self.publish_all([str(i).encode() for i in range(15)])
+            messages_with_timestamps, offset = self.mq.consume_messages("T1", 4, "S1")
+        assert(offset == 14)
+        assert(len(messages_with_timestamps) == 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
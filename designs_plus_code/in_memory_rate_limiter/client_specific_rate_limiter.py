@@ -15,111 +15,160 @@ When a request arrives:
     Otherwise → deny.
 
 The service must work correctly under high concurrency (multiple threads calling allow_request() for same or different clients).
+
+Hot clients can optionally be onboarded with a lease_size > 1, so that their callers don't all contend on the same
+bucket: a thread then takes up to lease_size tokens from the bucket at once, and serves its next requests for that
+client from this per-thread lease without touching the shared bucket. The trade-off is precision:
+    * The bucket keeps refilling while leases are outstanding, so the client can be admitted up to lease_size - 1
+      extra tokens per thread.
+    * Tokens leased by a thread that stops sending requests are only spent if that thread comes back.
+With the default lease_size of 1, every request is accounted for against the bucket exactly.
 """
 import time
 import threading
 from time import sleep
 
-from interfaces import RateLimiter
+from designs_plus_code.in_memory_rate_limiter.interfaces import RateLimiter
 import logging
 
+NUM_SHARDS = 16  # Number of stripes the client map is split into. Must be a power of two (see _get_shard).
+NS_PER_SECOND = 1_000_000_000
+
 class ClientState:
     # For each client, we maintain the following:
     #   1. The max tokens allowed for the client.
     #   2. The refill rate (tokens per second)
-    #   3. The 'monotonic' timestamp when the tokens available was updated
+    #   3. The 'monotonic' timestamp (in integer nanoseconds) when the tokens available was updated
     #   4. Tokens available (as of the timestamp in (3)).
+    #   5. The max tokens a thread takes from the bucket at once (see the module docstring).
     def __init__(
             self,
             max_tokens: int,
             refill_rate: int,
-            timestamp: float,
-            available_tokens: int
+            timestamp: int,
+            available_tokens: int,
+            lease_size: int = 1
     ):
         self.max_tokens = max_tokens
         self.refill_rate = refill_rate
         self.last_updated = timestamp
         self.last_available_tokens = available_tokens
+        self.lease_size = lease_size
 
 class ThreadSafeInMemoryRateLimiter(RateLimiter):
     def __init__(self):
-        # For each client, we are maintaining a tuple with the client's state and a lock, specific to the client
-        self._client_map = {
-            "dummy_client_id": (
-                ClientState(
-                    120,
-                    1,
-                    time.monotonic(),
-                    120
-                ),
-                threading.Lock()
-            ) #Adding a dummy client during init.
-        }
-        #A system level lock to protect operations across the dict (like adding clients)
-        self._lock = threading.Lock()
+        # For each client, we are maintaining an immutable ClientState. Updates never mutate it in place, they swap in a
+        # new ClientState (see _compare_and_swap), so reading a client's state needs no lock.
+        # Clients are striped across shards, each a (client_map, shard_lock) tuple. The shard lock protects writes to
+        # that shard only (adding clients, swapping states), so clients on different shards never contend.
+        # Readers never take it: a single dict lookup is atomic, and the map only ever gains keys, so lookups behave
+        # like the read side of a reader-writer lock without paying for one.
+        self._shards = [({}, threading.Lock()) for _ in range(NUM_SHARDS)]
+        # Per client, an allow_request specialized for the client's configuration (see _make_checker). Written once by
+        # add_client, under the client's shard lock.
+        self._checkers = {}
+        # Tokens each thread has leased from client buckets but not yet spent, as {client_id: tokens} per thread.
+        # Only the owning thread ever reads or writes its leases, so they need no lock.
+        self._thread_leases = threading.local()
+        self.add_client("dummy_client_id", 120, 1) #Adding a dummy client during init.
 
     def allow_request(self, client_id: str, cost:int = 1) -> bool:
         # ToDo: Add docstrings
-
-        if client_id in self._client_map:
-            client_state, client_lock = self._client_map[client_id]
-        else:
+        checker = self._checkers.get(client_id)
+        if checker is None:
             raise Exception(f"Client {client_id} is not onboarded.")
+        return checker(cost)
 
-        client_lock.acquire()
-        try:
-            max_tokens = client_state.max_tokens
-            refill_rate = client_state.refill_rate
-            last_updated = client_state.last_updated
-            last_available_tokens = client_state.last_available_tokens
-            new_ts = time.monotonic()
-            available_tokens = min(
-                int(last_available_tokens + ((new_ts - last_updated) * refill_rate)),
-                max_tokens
-            )
-            if available_tokens >= cost:
-                #Update the client's state before returning true
-                new_available_tokens = available_tokens - cost
-                self._client_map[client_id] = (
-                    ClientState(
+    def _make_checker(self, client_id: str, max_tokens: int, refill_rate: int, lease_size: int):
+        # Builds the allow_request logic for one client. A client's configuration never changes after onboarding, so
+        # it is captured in the closure: the hot path reads it from free variables instead of loading attributes off
+        # the ClientState on every call, and only the mutable part of the state goes through the CAS loop.
+        shard = self._get_shard(client_id)
+        client_map, _ = shard
+        compare_and_swap = self._compare_and_swap
+        get_thread_leases = self._get_thread_leases
+
+        def check(cost: int) -> bool:
+            leases = get_thread_leases()
+            leased_tokens = leases.get(client_id, 0)
+            if leased_tokens >= cost:
+                # Fast path: spend from this thread's lease, without touching the shared bucket
+                leases[client_id] = leased_tokens - cost
+                return True
+            required_tokens = cost - leased_tokens  # What the bucket has to cover, on top of this thread's leftover lease
+
+            try:
+                while True:
+                    client_state = client_map[client_id]
+                    # monotonic_ns returns an int, so with an integer refill_rate the accounting below stays in integer
+                    # arithmetic, with no float conversions and no int() truncation.
+                    new_ts = time.monotonic_ns()
+                    available_tokens = min(
+                        client_state.last_available_tokens
+                        + (new_ts - client_state.last_updated) * refill_rate // NS_PER_SECOND,
+                        max_tokens
+                    )
+                    if available_tokens < required_tokens:
+                        logging.info("Available tokens for client (%s) less than cost (%s)", available_tokens, cost)
+                        return False
+                    #Take a fresh lease, or at least what this request needs, and update the client's state before returning true
+                    leased_now = min(available_tokens, max(required_tokens, lease_size))
+                    new_client_state = ClientState(
                         max_tokens,
                         refill_rate,
                         new_ts,
-                        new_available_tokens
-                    ),
-                    client_lock
-                )
-                return True
-            else:
-                logging.info(f"Available tokens for client ({available_tokens}) less than cost ({cost})")
+                        available_tokens - leased_now,
+                        lease_size
+                    )
+                    if compare_and_swap(shard, client_id, client_state, new_client_state):
+                        leases[client_id] = leased_tokens + leased_now - cost
+                        return True
+                    #Another request updated the client's state after we read it. Retry against the latest state.
+            except Exception as e:
+                logging.error("An unexpected error occurred. Details: \n\t%s", e)
+                raise e
+
+        return check
+
+    def _get_thread_leases(self) -> dict:
+        leases = getattr(self._thread_leases, "by_client", None)
+        if leases is None:
+            leases = self._thread_leases.by_client = {}
+        return leases
+
+    def _get_shard(self, client_id: str) -> tuple:
+        return self._shards[hash(client_id) & (NUM_SHARDS - 1)]
+
+    def _compare_and_swap(self, shard: tuple, client_id: str, expected_state: ClientState, new_state: ClientState) -> bool:
+        # Installs new_state only if the client's state is still the exact object the caller computed from.
+        client_map, shard_lock = shard
+        with shard_lock:
+            if client_map[client_id] is not expected_state:
                 return False
-        except Exception as e:
-            logging.error(f"An unexpected error occurred. Details: \n\t{e}")
-            raise e
-        finally:
-            client_lock.release()
+            client_map[client_id] = new_state
+            return True
 
-    def add_client(self, client_id: str, max_tokens: int = 60, refill_rate: int = 1):
+    def add_client(self, client_id: str, max_tokens: int = 60, refill_rate: int = 1, lease_size: int = 1):
         # ToDo: Add docstrings
-        self._lock.acquire()
+        client_map, shard_lock = self._get_shard(client_id)
+        shard_lock.acquire()
         try:
-            if client_id in self._client_map:
+            if client_id in client_map:
                 raise Exception(f"Client {client_id} is already onboarded.")
-            client_lock = threading.Lock()
-            self._client_map[client_id] = (
-                ClientState(
-                    max_tokens,
-                    refill_rate,
-                    time.monotonic(),
-                    max_tokens
-                ),
-                client_lock
+            client_map[client_id] = ClientState(
+                max_tokens,
+                refill_rate,
+                time.monotonic_ns(),
+                max_tokens,
+                lease_size
             )
+            # Published last, so a client is only visible to allow_request once its state exists
+            self._checkers[client_id] = self._make_checker(client_id, max_tokens, refill_rate, lease_size)
         except Exception as e:
-            logging.error(f"An error occurred. Details: \n\t{e}")
+            logging.error("An error occurred. Details: \n\t%s", e)
             raise e
         finally:
-            self._lock.release()
+            shard_lock.release()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+import threading
+import unittest
+from unittest import mock
+
+from designs_plus_code.in_memory_rate_limiter.client_specific_rate_limiter import NS_PER_SECOND, \
+    ThreadSafeInMemoryRateLimiter
+
+
+class ThreadSafeInMemoryRateLimiterTests(unittest.TestCase):
+    # refill_rate=0 unless the test controls the clock, so that the number of tokens a client ever gets is exactly
+    # max_tokens
+
+    def count_admissions(self, rate_limiter, client_id, num_threads, requests_per_thread, cost=1):
+        admissions = [0] * num_threads
+        start = threading.Barrier(num_threads)
+
+        def send_requests(thread_index):
+            start.wait()
+            for _ in range(requests_per_thread):
+                if rate_limiter.allow_request(client_id, cost):
+                    admissions[thread_index] += 1
+
+        threads = [threading.Thread(target=send_requests, args=(i,)) for i in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(admissions)
+
+    def test_exact_admissions_across_threads(self):
+        rate_limiter = ThreadSafeInMemoryRateLimiter()
+        rate_limiter.add_client("client_1", max_tokens=1000, refill_rate=0)
+        assert(self.count_admissions(rate_limiter, "client_1", num_threads=8, requests_per_thread=200) == 1000)
+
+    def test_leased_admissions_are_bounded(self):
+        max_tokens, lease_size, num_threads = 100, 10, 8
+        rate_limiter = ThreadSafeInMemoryRateLimiter()
+        rate_limiter.add_client("client_1", max_tokens=max_tokens, refill_rate=0, lease_size=lease_size)
+        admissions = self.count_admissions(rate_limiter, "client_1", num_threads, requests_per_thread=100)
+        # Without refill, nothing beyond the bucket can be admitted. Tokens still leased to threads when they stop
+        # are the only ones lost, at most lease_size - 1 per thread.
+        assert(admissions <= max_tokens + (lease_size - 1) * num_threads)
+        assert(admissions >= max_tokens - (lease_size - 1) * num_threads)
+
+    def test_leftover_lease_is_spent_when_cost_exceeds_it(self):
+        rate_limiter = ThreadSafeInMemoryRateLimiter()
+        rate_limiter.add_client("client_1", max_tokens=7, refill_rate=0, lease_size=5)
+        assert(rate_limiter.allow_request("client_1", 1))    # Leases 5 tokens: 4 left in the lease, 2 in the bucket
+        assert(rate_limiter.allow_request("client_1", 6))    # The 4 leased tokens and the bucket's last 2
+        assert(not rate_limiter.allow_request("client_1", 1))
+
+    def test_cost_above_available_tokens_is_denied(self):
+        rate_limiter = ThreadSafeInMemoryRateLimiter()
+        rate_limiter.add_client("client_1", max_tokens=2, refill_rate=0)
+        assert(not rate_limiter.allow_request("client_1", 3))
+        assert(rate_limiter.allow_request("client_1", 2))
+
+    def test_refill_is_floored_and_capped(self):
+        now = [0]
+        with mock.patch("designs_plus_code.in_memory_rate_limiter.client_specific_rate_limiter.time.monotonic_ns",
+                        side_effect=lambda: now[0]):
+            rate_limiter = ThreadSafeInMemoryRateLimiter()
+            rate_limiter.add_client("client_1", max_tokens=5, refill_rate=2)
+            client_map, _ = rate_limiter._get_shard("client_1")
+            assert(rate_limiter.allow_request("client_1", 5))
+            assert(not rate_limiter.allow_request("client_1", 1))
+
+            now[0] = 4 * NS_PER_SECOND // 10     # 0.8 tokens refilled, floored to 0
+            assert(not rate_limiter.allow_request("client_1", 1))
+            # A denied request writes nothing, so the partial refill since the last admission isn't lost
+            assert(client_map["client_1"].last_updated == 0)
+            assert(client_map["client_1"].last_available_tokens == 0)
+
+            now[0] = 6 * NS_PER_SECOND // 10     # 1.2 tokens, floored to 1
+            assert(rate_limiter.allow_request("client_1", 1))
+            assert(not rate_limiter.allow_request("client_1", 1))
+            assert(client_map["client_1"].last_updated == now[0])
+
+            now[0] += 2 * NS_PER_SECOND          # Exactly 4 tokens
+            assert(rate_limiter.allow_request("client_1", 4))
+            assert(not rate_limiter.allow_request("client_1", 1))
+
+            now[0] += 100 * NS_PER_SECOND        # 200 tokens, capped at max_tokens
+            assert(not rate_limiter.allow_request("client_1", 6))
+            assert(rate_limiter.allow_request("client_1", 5))
+            assert(not rate_limiter.allow_request("client_1", 1))
+
+    def test_unknown_client_raises(self):
+        rate_limiter = ThreadSafeInMemoryRateLimiter()
+        with self.assertRaises(Exception):
+            rate_limiter.allow_request("unknown_client")
+
+
+if __name__ == '__main__':
+    unittest.main()
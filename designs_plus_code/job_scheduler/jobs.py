@@ -1,12 +1,16 @@
+import os
 import threading
 from abc import ABC, abstractmethod
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 import random
 
 from designs_plus_code.job_scheduler.constants import JOB_STATES
 
 #ToDo: Not ready. Several concurrency issues to be revisited.
 
+# Worker threads shared by all jobs, so running a job doesn't create (and tear down) OS threads of its own.
+_EXECUTOR = ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4)
+
 class Callable(ABC):
     @abstractmethod
     def call(self, **args):
@@ -34,8 +38,8 @@ class Cancelable(ABC):
 class VerySimpleJob(Callable, Cancelable):
 
     """
-    Accepts 'num_threads' as a parameter. Spawns that many number of thread.
-    Each thread prints a random number every second for five seconds, unless the job is cancelled.
+    Accepts 'num_threads' as a parameter. Runs that many workers on the shared thread pool.
+    Each worker prints a random number every second for five seconds, unless the job is cancelled.
     """
 
     def __init__(self, **kwargs):
@@ -43,28 +47,35 @@ class VerySimpleJob(Callable, Cancelable):
         self.lock = threading.Lock()
         self.isCancelable = True
         self.isPauseable = False
-        num_threads = kwargs.get("num_threads")
-        self.threads = [threading.Thread(target=self.return_random_integer, args=(i,)) for i in range(num_threads)]
+        self.num_threads = kwargs.get("num_threads")
+        self.pending_workers = self.num_threads
         self.state = JOB_STATES.INITIALIZED
         self.cancel_event = threading.Event()
-        self.watch_thread = threading.Thread(target=self.watch)
 
 
-    def watch(self):
-        for thread in self.threads:
-            thread.join()
+    def on_worker_done(self, future):
+        # Called as each worker finishes. The last one to finish marks the job as completed.
         with self.lock:
-            if self.state not in [JOB_STATES.CANCELLED, JOB_STATES.FAILED]:
-                self.state = JOB_STATES.COMPLETED
+            self.pending_workers -= 1
+            if self.pending_workers == 0:
+                self.mark_completed()
+
+    def mark_completed(self):
+        # Expects self.lock to be held
+        if self.state not in [JOB_STATES.CANCELLED, JOB_STATES.FAILED]:
+            self.state = JOB_STATES.COMPLETED
 
     def return_random_integer(self, id):
         try:
             print(f"Thread {id} is running")
+            rng = random.Random()   # Private to this thread, so threads don't share the module level generator
             i = 0
-            while i<5 and not self.cancel_event.is_set():
-                sleep(1)
+            while i<5:
+                # Waits one second, but returns True as soon as the job is cancelled
+                if self.cancel_event.wait(1):
+                    break
                 i+=1
-                print(f"Here's a random number from thread {id}: {random.randint(1, 10)}")
+                print(f"Here's a random number from thread {id}: {rng.randint(1, 10)}")
             print(f"Thread {id} is completed")
         except Exception as e:
             print(f"Thread {id} is terminated due to {e}")
@@ -78,10 +89,12 @@ class VerySimpleJob(Callable, Cancelable):
         return self.isPauseable
 
     def call(self, **args):
-        self.state = JOB_STATES.RUNNING
-        for thread in self.threads:
-            thread.start()
-        self.watch_thread.start()
+        with self.lock:
+            self.state = JOB_STATES.RUNNING
+            if self.num_threads == 0:
+                self.mark_completed()
+        for i in range(self.num_threads):
+            _EXECUTOR.submit(self.return_random_integer, i).add_done_callback(self.on_worker_done)
 
 
     def get_state(self):
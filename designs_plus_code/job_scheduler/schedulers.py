@@ -1,59 +1,64 @@
+import sys
 import threading
 import uuid
-from abc import ABC, abstractmethod
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
 
-class Scheduler(ABC):
+class Scheduler:
+    # Implementations override all the methods below, which raise NotImplementedError here.
 
-    @abstractmethod
     def run(self, callable, kwargs):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def schedule(self, callable):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def cancel(self, job_id):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def pause(self, job_id):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def describe_jobs(self):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def get_job_status(self, job_id):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def get_job_result(self, job_id):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def get_job_logs(self, job_id):
-        pass
+        raise NotImplementedError()
 
 
 class SimpleScheduler(Scheduler):
 
     # ToDo: Not ready. Several concurrency issues to be revisited.
 
-    def __init__(self):
+    def __init__(self, max_workers = None):
+        # Only run() takes the lock, to publish a new job. Jobs are never removed, and a single dict lookup is atomic,
+        # so the read paths look jobs up without it.
         self.lock = threading.Lock()
         self.jobs = {}
+        self.futures = {}   # job_id: Future of the job's call()
+        # Reused for every run instead of starting a new thread per job. max_workers=None uses ThreadPoolExecutor's
+        # default.
+        # Unlike the daemon threads jobs used to run on, pool threads are joined when the interpreter exits, so exit
+        # waits for running jobs to return instead of killing them midway. Cancel long jobs first to exit promptly.
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # cancel() and pause() are dispatched to a pool of their own: a job whose call() runs until it is cancelled
+        # holds one of the job workers for its whole run, and with every job worker taken, a cancel queued behind
+        # them would never run.
+        self.control_executor = ThreadPoolExecutor(max_workers=2)
 
     def run(self, callable, kwargs):
         print(f"Callable {callable.__class__} is scheduled with kwargs: {kwargs}")
-        job_id = uuid.uuid4()
+        job_id = uuid.uuid4().int    # Kept as a plain int: cheaper to hash and compare than a UUID object
         job = callable(**kwargs)
         with self.lock:
             self.jobs[job_id] = job
-        Thread(target=job.call, daemon=True).start()
+            self.futures[job_id] = self.executor.submit(job.call)
         return job_id
 
     def schedule(self, callable):
@@ -61,27 +66,36 @@ class SimpleScheduler(Scheduler):
         pass
 
     def cancel(self, job_id):
-        with self.lock:
-            if self.jobs[job_id].is_cancelable():
-                Thread(target = self.jobs[job_id].cancel, daemon=True).start()
+        job = self.jobs.get(job_id)
+        if job is not None and job.is_cancelable():
+            self.control_executor.submit(job.cancel)
 
     def pause(self, job_id):
-        with self.lock:
-            if self.jobs[job_id].is_pauseable():
-                Thread(target = self.jobs[job_id].pause, daemon=True).start()
+        job = self.jobs.get(job_id)
+        if job is not None and job.is_pauseable():
+            self.control_executor.submit(job.pause)
 
     def describe_jobs(self):
-        for job_id, job in self.jobs.items():
-            print(f"Job ID: {job_id}, Type: {job.__class__}, State: {job.get_state()}")
+        # Snapshot under the lock, as run() may be adding a job meanwhile, then format outside it and write it all at once
+        with self.lock:
+            jobs = list(self.jobs.items())
+        lines = [f"Job ID: {uuid.UUID(int=job_id)}, Type: {job.__class__}, State: {job.get_state()}" for job_id, job in jobs]
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
 
     def get_job_status(self, job_id):
-        with self.lock:
-            return self.jobs[job_id].get_state()
+        return self.jobs[job_id].get_state()
 
     def get_job_result(self, job_id):
-        with self.lock:
-            return self.jobs[job_id].get_state()
+        # Returns what the job's call() returned. Raises concurrent.futures.TimeoutError if it hasn't returned yet,
+        # and re-raises the exception if call() raised one.
+        return self.futures[job_id].result(timeout=0)
 
     def get_job_logs(self, job_id):
         pass
 
+    def shutdown(self, wait = False):
+        # Stops accepting new operations. Operations already submitted still run.
+        self.executor.shutdown(wait=wait)
+        self.control_executor.shutdown(wait=wait)
+
@@ -1,12 +1,30 @@
 import unittest
-from threading import Thread
+from threading import Event, Thread
 from time import sleep
 
 from designs_plus_code.job_scheduler.constants import JOB_STATES
-from designs_plus_code.job_scheduler.jobs import VerySimpleJob
+from designs_plus_code.job_scheduler.jobs import Callable, Cancelable, VerySimpleJob
 from designs_plus_code.job_scheduler.schedulers import SimpleScheduler
 
 
+class ReentrantCancelJob(Callable, Cancelable):
+    # Calls back into its scheduler from cancel(), like a job reporting its own state would
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.cancelled = Event()
+
+    def call(self):
+        self.cancelled.wait(5)
+
+    def is_cancelable(self):
+        return True
+
+    def cancel(self):
+        self.scheduler.describe_jobs()
+        self.cancelled.set()
+
+
 class SimpleSchedulerTests(unittest.TestCase):
     scheduler = SimpleScheduler()
 
@@ -32,6 +50,27 @@ class SimpleSchedulerTests(unittest.TestCase):
 
         assert(self.scheduler.get_job_status(job_id) == JOB_STATES.CANCELLED)
 
+    def test_scheduler_cancel_does_not_take_lock(self):
+        job_id = self.scheduler.run(ReentrantCancelJob, {"scheduler": self.scheduler})
+        # With the scheduler lock taken, e.g. by a job calling back into the scheduler, cancel() must still return
+        with self.scheduler.lock:
+            cancel_thread = Thread(target=self.scheduler.cancel, args=(job_id,))
+            cancel_thread.start()
+            cancel_thread.join(timeout=1)
+            assert(not cancel_thread.is_alive())
+        assert(self.scheduler.jobs[job_id].cancelled.wait(5))
+
+    def test_scheduler_cancel_while_jobs_hold_every_worker(self):
+        scheduler = SimpleScheduler(max_workers=1)
+        # call() holds the only job worker until the job is cancelled
+        job_id = scheduler.run(ReentrantCancelJob, {"scheduler": scheduler})
+        scheduler.cancel(job_id)
+        assert(scheduler.jobs[job_id].cancelled.wait(2))
+        scheduler.shutdown()
+
+    def test_scheduler_cancel_unknown_job(self):
+        self.scheduler.cancel(-1)
+
     def probe_job_status(self, job_id):
         while True and self.scheduler.get_job_status(job_id) in [JOB_STATES.INITIALIZED, JOB_STATES.RUNNING]:
             print(f"Job status: {self.scheduler.get_job_status(job_id)}")
@@ -0,0 +1,25 @@
+# Compiles the parity filter kernel ahead of time into the ll_kernels extension module, next to this file:
+#
+#     python build_ext.py
+#
+# linked_list.py then uses ll_kernels.filter_parity for its array filters when it's there, and skips importing numba and
+# JIT compiling on the first such filter of every process. Without the module it falls back to @njit, and then to numpy
+# alone. Needs numba and a C compiler. numba.pycc is deprecated in recent numba releases, in which case the build fails
+# here and the fallbacks are used.
+
+import os
+
+from numba.pycc import CC
+
+cc = CC('ll_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+@cc.export('filter_parity', 'i8[:](i8[:], i8)')
+def filter_parity(arr, parity):
+    # Same as linked_list._mask_parity. The parentheses matter: == binds tighter than &
+    return arr[(arr & 1) == parity]
+
+
+if __name__ == "__main__":
+    cc.compile()
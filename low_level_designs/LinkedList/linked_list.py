@@ -1,21 +1,30 @@
-from abc import abstractmethod, ABC
+from array import array
 
+try:
+    import numpy as np
+except ImportError:     # numpy (and numba on top of it) are optional: without them the filters stay pure Python
+    np = None
+
+# Lists shorter than this are filtered in pure Python even with numpy available. The array path saves little per node
+# (rebuilding the result nodes dominates), so it pays off only on long lists, and its first use also imports numba.
+ARRAY_FILTER_MIN_LENGTH = 10_000
+
+
+class IterationStrategy:
+    __slots__ = ()
 
-class IterationStrategy(ABC):
-    @abstractmethod
     def iterate(self):
         raise NotImplementedError()
 
 
-class FilterStrategy(ABC):
-    @abstractmethod
+class FilterStrategy:
     def apply(self, ds):
         raise NotImplementedError()
 
 
-class DataStructure(ABC):
+class DataStructure:
+    __slots__ = ()  # Lets subclasses that declare __slots__ do without a per-instance __dict__
 
-    @abstractmethod
     def get_iteration_strategy(self):
         raise NotImplementedError()
 
@@ -31,6 +40,9 @@ class DataStructure(ABC):
 
 
 class Node:
+    # No per-instance __dict__: a node is just its three fields, which keeps lists and filter results small
+    __slots__ = ('data', 'next', 'prev')
+
     def __init__(self, data, next = None, prev = None):
         self.data = data
         self.next = next
@@ -41,52 +53,239 @@ class Node:
 
 
 class LinkedList(DataStructure):
+    __slots__ = ('head', 'tail', '_len', '_iteration_strategy', '_strategy', '_data_cache', '_dirty')
+
     def __init__(self, head=None, iteration_strategy = None):
         self.head = head
         self.tail = head
+        # Kept up to date by the builder, and set by whoever links up a longer list
+        self._len = 0 if head is None else 1
         self.iteration_strategy = iteration_strategy or ForwardIterationStrategy
+        self._data_cache = None     # Array of the node values kept by as_array(), rebuilt when _dirty
+        self._dirty = True
+
+    @property
+    def iteration_strategy(self):
+        return self._iteration_strategy
+
+    @iteration_strategy.setter
+    def iteration_strategy(self, iteration_strategy):
+        self._iteration_strategy = iteration_strategy
+        self._strategy = None   # Instance of the strategy, created on the first traversal with it
+
+    def __len__(self):
+        return self._len
 
     def get_iteration_strategy(self):
         return self.iteration_strategy
 
+    def filter_iter(self, filter_strategy):
+        # Lazy counterpart of filter(), for one pass over the result: yields the matching nodes of this list, without
+        # allocating a new list
+        return filter_strategy.apply_iter(self)
+
+    def traverse(self):
+        # The strategy instance only holds a reference to this list, and hands out a new iterator on every iter(), so
+        # one instance is reused for all traversals until the strategy is changed.
+        strategy = self._strategy
+        if strategy is None:
+            strategy = self._strategy = self._iteration_strategy(self)
+        return iter(strategy)
+
+    def to_ndarray(self):
+        # Node values head to tail, as a dense int64 array that numpy/numba can work on. Needs numpy, and integer data:
+        # anything else (floats, bools, ints beyond 64 bits) would be silently converted, so it's refused instead.
+        if not self._len:
+            return np.empty(0, dtype=np.int64)
+        arr = np.array([node.data for node in ForwardIterationStrategy(self)])
+        if arr.dtype.kind != 'i':
+            raise TypeError("to_ndarray() needs int64 values, the list holds %s data" % arr.dtype)
+        return arr.astype(np.int64, copy=False)
+
+    def as_array(self):
+        # Like to_ndarray(), but the array is kept and reused until the list is changed through the builder, so repeated
+        # filters copy the nodes only once. It's read-only, since it's shared. Changing node values directly, bypassing
+        # the builder, isn't seen: set _dirty after doing so.
+        if self._dirty:
+            arr = self.to_ndarray()
+            arr.flags.writeable = False
+            self._data_cache = arr
+            self._dirty = False
+        return self._data_cache
+
     def __str__(self):
-        ret_arr = []
-        curr = self.head
-        while curr:
-            ret_arr.append(curr.data)
-            curr = curr.next
-        return str(ret_arr)
+        # Always head to tail, whatever the current iteration strategy. Formatted like a list, i.e. with repr()
+        return "[" + ", ".join(repr(node.data) for node in ForwardIterationStrategy(self)) + "]"
+
+
+class FilteredLinkedListView(DataStructure):
+    # What filtering a LinkedList returns: the nodes of the source list that pass the filter, found while iterating,
+    # so nothing is allocated for callers that only iterate. Always head to tail, and it reflects later changes to the
+    # source. materialize() copies the result into a LinkedList of its own.
+    __slots__ = ('source', 'filter_strategy')
+
+    def __init__(self, source, filter_strategy):
+        self.source = source
+        self.filter_strategy = filter_strategy
+
+    def get_iteration_strategy(self):
+        # traverse() below doesn't use one: the view has no nodes of its own for a strategy to walk
+        raise NotImplementedError(
+            "A FilteredLinkedListView always iterates head to tail. materialize() it to use an iteration strategy."
+        )
+
+    def traverse(self):
+        return self.filter_strategy.apply_iter(self.source)
+
+    def __len__(self):
+        # O(n), unlike LinkedList's: the view keeps no count, so the matching nodes are counted by walking the source
+        return sum(1 for _ in self.traverse())
+
+    def materialize(self):
+        return self.filter_strategy.materialize(self.source)
+
+    def filter(self, filter_strategy: FilterStrategy):
+        # Filter strategies walk a LinkedList's nodes directly, so the view is copied first
+        return self.materialize().filter(filter_strategy)
+
+    def __str__(self):
+        return "[" + ", ".join(repr(node.data) for node in self.traverse()) + "]"
 
 
 class LinkedListFilterStrategy(FilterStrategy):
-    @abstractmethod
-    def apply(self, linked_list: LinkedList) -> LinkedList:
+    def apply_iter(self, linked_list: LinkedList):
+        # Yields the nodes of linked_list that pass the filter. These are the list's own nodes, not copies.
         raise NotImplementedError()
 
+    def materialize(self, linked_list: LinkedList) -> LinkedList:
+        # The filter's result as a new LinkedList
+        return _link(node.data for node in self.apply_iter(linked_list))
 
-class OddNumberFilterStrategy(LinkedListFilterStrategy):
-    def apply(self, linked_list: LinkedList):
-        builder = LinkedListBuilder()
+    def apply(self, linked_list: LinkedList) -> FilteredLinkedListView:
+        return FilteredLinkedListView(linked_list, self)
+
+
+class PredicateFilterStrategy(LinkedListFilterStrategy):
+    # Keeps the values for which predicate(value) is truthy. A materialized result is linked up in the same pass as the
+    # filtering, directly on local head/tail references, rather than through a builder call per kept node.
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def apply_iter(self, linked_list: LinkedList):
+        predicate = self.predicate
         curr = linked_list.head
-        while curr:
-            if curr.data % 2 == 1:
-                builder.with_next(curr.data)
+        while curr is not None:
+            if predicate(curr.data):
+                yield curr
             curr = curr.next
-        return builder.build()
 
-
-class EvenNumberFilterStrategy(LinkedListFilterStrategy):
-    def apply(self, linked_list: LinkedList):
-        builder = LinkedListBuilder()
+    def materialize(self, linked_list: LinkedList):
+        predicate = self.predicate
+        head = tail = None
+        length = 0
         curr = linked_list.head
-        while curr:
-            if curr.data % 2 == 0:
-                builder.with_next(curr.data)
+        while curr is not None:
+            if predicate(curr.data):
+                node = Node(curr.data, prev=tail)
+                if tail is not None:
+                    tail.next = node
+                else:
+                    head = node
+                tail = node
+                length += 1
             curr = curr.next
-        return builder.build()
+        filtered_linked_list = LinkedList(head)
+        filtered_linked_list.tail = tail
+        filtered_linked_list._len = length
+        return filtered_linked_list
+
+
+def _mask_parity(arr, parity):
+    # Two's complement & 1 gives the same parity as Python's % 2 on negative values too. The parentheses matter: ==
+    # binds tighter than &
+    return arr[(arr & 1) == parity]
+
+
+_parity_kernel = None   # Resolved by _get_parity_kernel()
+
+
+def _get_parity_kernel():
+    # The fastest available implementation of _mask_parity: compiled ahead of time by build_ext.py if it was run, else
+    # compiled by numba if that's installed, else _mask_parity itself with plain numpy. Looked up on the first array
+    # filter rather than at import, since importing numba alone takes a noticeable fraction of a second.
+    global _parity_kernel
+    if _parity_kernel is None:
+        try:
+            if __package__:
+                from .ll_kernels import filter_parity as kernel
+            else:
+                from ll_kernels import filter_parity as kernel
+        except ImportError:
+            try:
+                from numba import njit
+                kernel = njit(cache=True)(_mask_parity)
+            except ImportError:
+                kernel = _mask_parity
+        _parity_kernel = kernel
+    return _parity_kernel
+
+
+def _link(values):
+    # Links the values up into a new list in a single pass
+    head = tail = None
+    length = 0
+    for value in values:
+        node = Node(value, prev=tail)
+        if tail is not None:
+            tail.next = node
+        else:
+            head = node
+        tail = node
+        length += 1
+    linked_list = LinkedList(head)
+    linked_list.tail = tail
+    linked_list._len = length
+    return linked_list
+
+
+class ParityFilterStrategy(PredicateFilterStrategy):
+    # Keeps the values of the given parity, 1 for odd and 0 for even, i.e. those with value % 2 == parity. With numpy
+    # available, materializing a list of at least ARRAY_FILTER_MIN_LENGTH values filters the list's cached array (see
+    # LinkedList.as_array()) instead, with the kernel from _get_parity_kernel(); values that don't fit an int64 take the
+    # pure Python path.
+    def __init__(self, parity):
+        # For ints, bitwise & 1 used as the truth value is cheaper than % 2 and a compare, and gives the same parity on
+        # negative ones too. Anything else (floats, bools, ...) keeps the % 2 semantics.
+        if parity:
+            predicate = lambda data: data & 1 if data.__class__ is int else data % 2 == 1
+        else:
+            predicate = lambda data: not data & 1 if data.__class__ is int else data % 2 == 0
+        super().__init__(predicate)
+        self.parity = parity
+
+    def materialize(self, linked_list: LinkedList):
+        if np is None or len(linked_list) < ARRAY_FILTER_MIN_LENGTH:
+            return super().materialize(linked_list)
+        try:
+            arr = linked_list.as_array()
+        except (OverflowError, TypeError, ValueError):
+            return super().materialize(linked_list)
+        return _link(_get_parity_kernel()(arr, self.parity).tolist())
+
+
+class OddNumberFilterStrategy(ParityFilterStrategy):
+    def __init__(self):
+        super().__init__(1)
+
+
+class EvenNumberFilterStrategy(ParityFilterStrategy):
+    def __init__(self):
+        super().__init__(0)
 
 
 class ForwardIterationStrategy(IterationStrategy):
+    __slots__ = ('linked_list',)
+
     def __init__(self, linked_list):
         self.linked_list = linked_list
 
@@ -94,13 +293,16 @@ class ForwardIterationStrategy(IterationStrategy):
         return self.iterate()
 
     def iterate(self):
+        # A generator is the fastest iterator CPython offers here; a class with __next__ pays a method call per node.
+        # "is not None" skips the truth test protocol lookup that "while curr" does on every node.
         curr = self.linked_list.head
-        while curr:
+        while curr is not None:
             yield curr
             curr = curr.next
 
 
 class BackwardIterationStrategy(IterationStrategy):
+    __slots__ = ('linked_list',)
 
     def __init__(self, linked_list):
         self.linked_list = linked_list
@@ -110,41 +312,169 @@ class BackwardIterationStrategy(IterationStrategy):
 
     def iterate(self):
         curr = self.linked_list.tail
-        while curr:
+        while curr is not None:
             yield curr
             curr = curr.prev
 
 
 class LinkedListBuilder:
+    __slots__ = ('linked_list',)
+
     def __init__(self, linked_list: LinkedList = None):
-        self.linked_list = linked_list or LinkedList()
+        # Not "linked_list or ...": an empty list is falsy now that it has a length
+        self.linked_list = linked_list if linked_list is not None else LinkedList()
 
     def with_next(self, value):
-        new_node = Node(value)
-        if not self.linked_list.head:
-            self.linked_list.head = new_node
-            self.linked_list.tail = new_node
+        # Attributes are read once into locals, and each one written once
+        linked_list = self.linked_list
+        tail = linked_list.tail
+        new_node = Node(value, prev=tail)
+        if linked_list.head is None:
+            linked_list.head = new_node
         else:
-            self.linked_list.tail.next = new_node
-            new_node.prev = self.linked_list.tail
-            self.linked_list.tail = self.linked_list.tail.next
+            tail.next = new_node
+        linked_list.tail = new_node
+        linked_list._len += 1
+        linked_list._dirty = True
         return self
 
     def with_prev(self, value):
-        new_node = Node(value)
-        if not self.linked_list.head:
-            self.linked_list.head = new_node
-            self.linked_list.tail = new_node
+        linked_list = self.linked_list
+        head = linked_list.head
+        new_node = Node(value, next=head)
+        if head is None:
+            linked_list.tail = new_node
         else:
-            self.linked_list.head.prev = new_node
-            new_node.next = self.linked_list.head
-            self.linked_list.head = self.linked_list.head.prev
+            head.prev = new_node
+        linked_list.head = new_node
+        linked_list._len += 1
+        linked_list._dirty = True
         return self
 
     def build(self):
         return self.linked_list
 
 
+class PackedLinkedList(DataStructure):
+    # A linked list for int64 data. The values are stored unboxed in one contiguous array('q') instead of in a Node
+    # each, and the links are indices into it held in array('i')s, with -1 for none. Appending a value that doesn't fit
+    # an int64 raises, as array.array does: LinkedList is for anything else. Iterating it yields the values themselves.
+    __slots__ = ('_buf', '_next', '_prev', 'head', 'tail', '_in_order', 'iteration_strategy')
+
+    def __init__(self, iteration_strategy = None):
+        self._buf = array('q')
+        self._next = array('i')
+        self._prev = array('i')
+        self.head = self.tail = -1
+        self._in_order = True   # Until with_prev() links a value in front, _buf holds the values head to tail
+        self.iteration_strategy = iteration_strategy or PackedForwardIterationStrategy
+
+    def __len__(self):
+        return len(self._buf)
+
+    def get_iteration_strategy(self):
+        return self.iteration_strategy
+
+    def with_next(self, value):
+        index = len(self._buf)
+        self._buf.append(value)     # First, so that a value that doesn't fit leaves the list as it was
+        self._next.append(-1)
+        self._prev.append(self.tail)
+        if self.tail == -1:
+            self.head = index
+        else:
+            self._next[self.tail] = index
+        self.tail = index
+        return self
+
+    def with_prev(self, value):
+        index = len(self._buf)
+        self._buf.append(value)
+        self._next.append(self.head)
+        self._prev.append(-1)
+        if self.head == -1:
+            self.tail = index
+        else:
+            self._prev[self.head] = index
+            self._in_order = False
+        self.head = index
+        return self
+
+    def _ordered_values(self):
+        # The values head to tail as an array('q'): _buf itself while it's in that order, otherwise a copy
+        if self._in_order:
+            return self._buf
+        return array('q', PackedForwardIterationStrategy(self))
+
+    def __str__(self):
+        return str(self._ordered_values().tolist())
+
+
+def _pack(buf):
+    # PackedLinkedList of the values in the array('q') buf, linked up in order
+    packed_list = PackedLinkedList()
+    length = len(buf)
+    packed_list._buf = buf
+    packed_list._next = array('i', range(1, length + 1))
+    if length:
+        packed_list._next[-1] = -1
+    packed_list._prev = array('i', range(-1, length - 1))
+    packed_list.head = 0 if length else -1
+    packed_list.tail = length - 1
+    return packed_list
+
+
+class PackedParityFilterStrategy(FilterStrategy):
+    # ParityFilterStrategy for a PackedLinkedList. Its values are already a dense int64 buffer, so with numpy available
+    # (and at least ARRAY_FILTER_MIN_LENGTH values) they're filtered in place by the parity kernel, without a copy into
+    # an array first. The result is a new PackedLinkedList.
+    def __init__(self, parity):
+        self.parity = parity
+
+    def apply(self, packed_list: PackedLinkedList) -> PackedLinkedList:
+        values = packed_list._ordered_values()
+        if np is None or len(values) < ARRAY_FILTER_MIN_LENGTH:
+            parity = self.parity
+            return _pack(array('q', [value for value in values if (value & 1) == parity]))
+        return _pack(array('q', _get_parity_kernel()(np.frombuffer(values, dtype=np.int64), self.parity).tobytes()))
+
+
+class PackedForwardIterationStrategy(IterationStrategy):
+    __slots__ = ('packed_list',)
+
+    def __init__(self, packed_list):
+        self.packed_list = packed_list
+
+    def __iter__(self):
+        return self.iterate()
+
+    def iterate(self):
+        packed_list = self.packed_list
+        buf, next = packed_list._buf, packed_list._next
+        index = packed_list.head
+        while index != -1:
+            yield buf[index]
+            index = next[index]
+
+
+class PackedBackwardIterationStrategy(IterationStrategy):
+    __slots__ = ('packed_list',)
+
+    def __init__(self, packed_list):
+        self.packed_list = packed_list
+
+    def __iter__(self):
+        return self.iterate()
+
+    def iterate(self):
+        packed_list = self.packed_list
+        buf, prev = packed_list._buf, packed_list._prev
+        index = packed_list.tail
+        while index != -1:
+            yield buf[index]
+            index = prev[index]
+
+
 if __name__ == "__main__":
 
     linked_list = LinkedListBuilder().with_next(3).with_next(4).with_next(5).with_prev(2).with_prev(1).build()
@@ -153,13 +483,12 @@ if __name__ == "__main__":
     print(linked_list)
 
     print("\nNew linked list with only odd numbers from original:")
-    odd_number_filtered_linked_list = linked_list.filter(OddNumberFilterStrategy())
+    odd_number_filtered_linked_list = linked_list.filter(OddNumberFilterStrategy()).materialize()
     for node in odd_number_filtered_linked_list:
         print(node)
 
-    print("\nNew linked list with only even numbers from original:")
-    even_number_filtered_linked_list = linked_list.filter(EvenNumberFilterStrategy())
-    for node in even_number_filtered_linked_list:
+    print("\nOnly even numbers from original, filtered lazily:")
+    for node in linked_list.filter_iter(EvenNumberFilterStrategy()):
         print(node)
 
     linked_list.iteration_strategy = ForwardIterationStrategy
@@ -171,3 +500,8 @@ if __name__ == "__main__":
     print("\nBackward iteration:")
     for node in linked_list:
         print(node)
+
+    packed_list = PackedLinkedList().with_next(3).with_next(4).with_next(5).with_prev(2).with_prev(1)
+    print("\nPacked linked list, and its odd numbers:")
+    print(packed_list)
+    print(packed_list.filter(PackedParityFilterStrategy(1)))
@@ -0,0 +1,226 @@
+import unittest
+from unittest import mock
+
+from low_level_designs.LinkedList import linked_list
+from low_level_designs.LinkedList.linked_list import (
+    BackwardIterationStrategy, FilteredLinkedListView, ForwardIterationStrategy, LinkedList, LinkedListBuilder, Node,
+    EvenNumberFilterStrategy, OddNumberFilterStrategy, PackedBackwardIterationStrategy, PackedForwardIterationStrategy,
+    PackedLinkedList, PackedParityFilterStrategy, ParityFilterStrategy, PredicateFilterStrategy
+)
+
+
+def values(nodes):
+    return [node.data for node in nodes]
+
+
+class LinkedListTests(unittest.TestCase):
+
+    def mixed_list(self):
+        # Built as 3, 4, then 2 and 1 in front, then 5 at the back
+        return LinkedListBuilder().with_next(3).with_next(4).with_prev(2).with_prev(1).with_next(5).build()
+
+    def assert_linked(self, linked_list, expected):
+        # Both directions, the length, and every next/prev pair agreeing
+        assert(values(ForwardIterationStrategy(linked_list)) == expected)
+        assert(values(BackwardIterationStrategy(linked_list)) == expected[::-1])
+        assert(len(linked_list) == len(expected))
+        if expected:
+            assert(linked_list.head.prev is None)
+            assert(linked_list.tail.next is None)
+        else:
+            assert(linked_list.head is None and linked_list.tail is None)
+        for node in ForwardIterationStrategy(linked_list):
+            if node.next is not None:
+                assert(node.next.prev is node)
+
+    def test_mixed_inserts_iterate_both_ways(self):
+        self.assert_linked(self.mixed_list(), [1, 2, 3, 4, 5])
+        self.assert_linked(LinkedListBuilder().with_prev(2).with_prev(1).with_next(3).build(), [1, 2, 3])
+
+    def test_switching_iteration_strategy(self):
+        linked_list = self.mixed_list()
+        assert(values(linked_list) == [1, 2, 3, 4, 5])
+        linked_list.iteration_strategy = BackwardIterationStrategy
+        assert(values(linked_list) == [5, 4, 3, 2, 1])
+        LinkedListBuilder(linked_list).with_next(6)     # Seen by the strategy instance reused from the last traversal
+        assert(values(linked_list) == [6, 5, 4, 3, 2, 1])
+        linked_list.iteration_strategy = ForwardIterationStrategy
+        assert(values(linked_list) == [1, 2, 3, 4, 5, 6])
+        assert(str(linked_list) == "[1, 2, 3, 4, 5, 6]")
+
+    def test_len(self):
+        assert(len(LinkedList()) == 0)
+        assert(len(LinkedList(Node(1))) == 1)
+        built = self.mixed_list()
+        assert(len(built) == 5)
+        assert(len(built.filter(OddNumberFilterStrategy()).materialize()) == 3)
+        assert(len(built.filter(PredicateFilterStrategy(lambda data: data > 5)).materialize()) == 0)
+
+    def test_builder_wraps_empty_list(self):
+        empty_list = LinkedList()
+        builder = LinkedListBuilder(empty_list)
+        assert(builder.build() is empty_list)
+        builder.with_next(2).with_prev(1)
+        self.assert_linked(empty_list, [1, 2])
+
+    def test_view_reflects_later_changes_to_source(self):
+        source = self.mixed_list()
+        view = source.filter(OddNumberFilterStrategy())
+        assert(isinstance(view, FilteredLinkedListView))
+        assert(values(view) == [1, 3, 5])
+        LinkedListBuilder(source).with_next(7).with_prev(-1).with_next(8)
+        assert(values(view) == [-1, 1, 3, 5, 7])
+        assert(len(view) == 5)
+        assert(str(view) == "[-1, 1, 3, 5, 7]")
+
+    def test_materialize_links_a_list_of_its_own(self):
+        source = self.mixed_list()
+        for filter_strategy in (OddNumberFilterStrategy(), PredicateFilterStrategy(lambda data: data > 1)):
+            materialized = source.filter(filter_strategy).materialize()
+            expected = [data for data in [1, 2, 3, 4, 5] if filter_strategy.predicate(data)]
+            self.assert_linked(materialized, expected)
+            # Copies: the source is untouched, and extending the result through its tail works
+            source_nodes = set(ForwardIterationStrategy(source))
+            assert(not source_nodes.intersection(ForwardIterationStrategy(materialized)))
+            LinkedListBuilder(materialized).with_next(9)
+            self.assert_linked(materialized, expected + [9])
+            self.assert_linked(source, [1, 2, 3, 4, 5])
+        self.assert_linked(source.filter(PredicateFilterStrategy(lambda data: False)).materialize(), [])
+
+    def test_parity_filters_match_modulo(self):
+        # Each row goes through filter_iter(), the pure Python materialize() and the array path; rows that don't fit an
+        # int64 array fall back from the latter to the pure Python path
+        rows = [
+            [-4, -3, -2, -1, 0, 1, 2, 3],
+            [2 ** 70, 2 ** 70 + 1, -2 ** 70 - 1, 5],
+            [3.0, 3.5, -3.5, -3.0, 2.0, 0.5],
+            [True, False, True],
+            [1, 2.0, True, 2 ** 64, -7],
+        ]
+        for row in rows:
+            source = LinkedListBuilder()
+            for value in row:
+                source.with_next(value)
+            source = source.build()
+            for filter_strategy in (OddNumberFilterStrategy(), EvenNumberFilterStrategy(), ParityFilterStrategy(1)):
+                expected = [value for value in row if value % 2 == filter_strategy.parity]
+                assert(values(source.filter_iter(filter_strategy)) == expected)
+                with mock.patch.object(linked_list, "np", None):
+                    self.assert_linked(source.filter(filter_strategy).materialize(), expected)
+                if linked_list.np is not None:
+                    with mock.patch.object(linked_list, "ARRAY_FILTER_MIN_LENGTH", 0):
+                        materialized = source.filter(filter_strategy).materialize()
+                    self.assert_linked(materialized, expected)
+                    # The array path hands back plain ints, and fallbacks keep the values as they were
+                    assert([type(data) for data in values(ForwardIterationStrategy(materialized))]
+                           == [type(value) for value in expected])
+
+
+@unittest.skipIf(linked_list.np is None, "numpy is not installed")
+class LinkedListAsArrayTests(unittest.TestCase):
+
+    def test_cached_until_changed(self):
+        builder = LinkedListBuilder().with_next(2).with_next(3)
+        built = builder.build()
+        arr = built.as_array()
+        assert(built.as_array() is arr)
+        builder.with_next(4)
+        appended = built.as_array()
+        assert(appended is not arr)
+        assert(appended.tolist() == [2, 3, 4])
+        assert(arr.tolist() == [2, 3])     # Arrays already handed out aren't changed
+        builder.with_prev(1)
+        assert(built.as_array().tolist() == [1, 2, 3, 4])
+        assert(built.as_array() is built.as_array())
+
+    def test_read_only(self):
+        arr = LinkedListBuilder().with_next(1).build().as_array()
+        assert(not arr.flags.writeable)
+        with self.assertRaises(ValueError):
+            arr[0] = 2
+
+    def test_long_list_filters_after_appending(self):
+        builder = LinkedListBuilder()
+        for value in range(linked_list.ARRAY_FILTER_MIN_LENGTH):
+            builder.with_next(value)
+        source = builder.build()
+        for _ in range(2):
+            source_values = values(ForwardIterationStrategy(source))
+            for filter_strategy in (OddNumberFilterStrategy(), EvenNumberFilterStrategy()):
+                expected = [value for value in source_values if value % 2 == filter_strategy.parity]
+                assert(values(source.filter(filter_strategy).materialize()) == expected)
+            builder.with_next(10_001).with_prev(-2).with_prev(-1)
+
+
+class PackedLinkedListTests(unittest.TestCase):
+
+    def mixed_list(self):
+        # Built as 3, 4, 5, then 2 and 1 in front, then 6 at the back: stored out of list order
+        return PackedLinkedList().with_next(3).with_next(4).with_next(5).with_prev(2).with_prev(1).with_next(6)
+
+    def test_mixed_inserts_iterate_in_list_order(self):
+        packed_list = self.mixed_list()
+        assert(list(PackedForwardIterationStrategy(packed_list)) == [1, 2, 3, 4, 5, 6])
+        assert(list(PackedBackwardIterationStrategy(packed_list)) == [6, 5, 4, 3, 2, 1])
+        assert(list(packed_list) == [1, 2, 3, 4, 5, 6])
+        packed_list.iteration_strategy = PackedBackwardIterationStrategy
+        assert(list(packed_list) == [6, 5, 4, 3, 2, 1])
+        assert(len(packed_list) == 6)
+        assert(str(packed_list) == "[1, 2, 3, 4, 5, 6]")
+
+    def test_with_prev_into_empty_list(self):
+        packed_list = PackedLinkedList().with_prev(2).with_prev(1).with_next(3)
+        assert(list(packed_list) == [1, 2, 3])
+        assert(list(PackedBackwardIterationStrategy(packed_list)) == [3, 2, 1])
+
+    def assert_filters(self, packed_list, odd, even):
+        odd_list = packed_list.filter(PackedParityFilterStrategy(1))
+        even_list = packed_list.filter(PackedParityFilterStrategy(0))
+        assert(list(odd_list) == odd)
+        assert(list(PackedBackwardIterationStrategy(odd_list)) == odd[::-1])
+        assert(list(even_list) == even)
+        assert(len(odd_list) == len(odd))
+
+    def test_filter_without_numpy(self):
+        with mock.patch.object(linked_list, "np", None):
+            self.assert_filters(self.mixed_list().with_prev(-3), [-3, 1, 3, 5], [2, 4, 6])
+
+    @unittest.skipIf(linked_list.np is None, "numpy is not installed")
+    def test_filter_with_numpy(self):
+        with mock.patch.object(linked_list, "ARRAY_FILTER_MIN_LENGTH", 0):
+            self.assert_filters(self.mixed_list().with_prev(-3), [-3, 1, 3, 5], [2, 4, 6])
+            # Still in storage order, so the buffer is filtered as is
+            self.assert_filters(PackedLinkedList().with_next(-2).with_next(7), [7], [-2])
+
+    def test_empty_list(self):
+        packed_list = PackedLinkedList()
+        assert(list(packed_list) == [])
+        assert(list(PackedBackwardIterationStrategy(packed_list)) == [])
+        assert(len(packed_list) == 0)
+        assert(str(packed_list) == "[]")
+        with mock.patch.object(linked_list, "np", None):
+            self.assert_filters(packed_list, [], [])
+        if linked_list.np is not None:
+            with mock.patch.object(linked_list, "ARRAY_FILTER_MIN_LENGTH", 0):
+                self.assert_filters(packed_list, [], [])
+
+    def test_filter_result_can_be_extended(self):
+        odd_list = self.mixed_list().filter(PackedParityFilterStrategy(1))
+        odd_list.with_prev(-1).with_next(7)
+        assert(list(odd_list) == [-1, 1, 3, 5, 7])
+        assert(list(PackedBackwardIterationStrategy(odd_list)) == [7, 5, 3, 1, -1])
+
+    def test_value_out_of_range_leaves_list_unchanged(self):
+        packed_list = self.mixed_list()
+        for value, error in ((2 ** 63, OverflowError), (-2 ** 63 - 1, OverflowError), (1.5, TypeError)):
+            with self.assertRaises(error):
+                packed_list.with_next(value)
+            with self.assertRaises(error):
+                packed_list.with_prev(value)
+        assert(list(packed_list) == [1, 2, 3, 4, 5, 6])
+        assert(list(PackedBackwardIterationStrategy(packed_list)) == [6, 5, 4, 3, 2, 1])
+        assert(len(packed_list) == 6)
+
+
+if __name__ == '__main__':
+    unittest.main()